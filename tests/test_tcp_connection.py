@@ -1,20 +1,85 @@
 """
 Unit tests for TCP connection functionality in XYScreens.
 
+The tests don't share state between test classes and the mock TCP servers bind to ephemeral
+ports, so the module can run in parallel with pytest-xdist (pytest -n auto).
+
 Created on 15 Oct 2025
 @author: Claude Code
 """
 
 import asyncio
+import select
+import selectors
 import socket
+import sys
 import threading
-import time
 import unittest
-from unittest.mock import Mock, patch, AsyncMock
+
+import serial
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 
 from xyscreens import XYScreens, XYScreensConnectionError, XYScreensState
 
 
+class _ServerHub:
+    """Services the sockets of all mock TCP servers from one background thread."""
+
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.lock = threading.RLock()
+        self.thread = None
+
+    def register(self, sock, callback):
+        """Call callback with sock whenever sock becomes readable."""
+        with self.lock:
+            self.selector.register(sock, selectors.EVENT_READ, callback)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._loop, daemon=True)
+                self.thread.start()
+
+    def unregister(self, sock):
+        """Stop watching sock."""
+        with self.lock:
+            self.selector.unregister(sock)
+
+    def _loop(self):
+        while True:
+            # Use a short timeout so newly registered sockets are picked up by every selector
+            # implementation.
+            events = self.selector.select(timeout=0.05)
+            with self.lock:
+                for key, _ in events:
+                    if key.fileobj.fileno() != -1:
+                        key.data(key.fileobj)
+
+
+_SERVER_HUB = _ServerHub()
+
+# Connection endpoints with whether they are TCP endpoints and the host and port they parse to,
+# None when parsing should fail.
+DEVICES = [
+    # TCP connections
+    ("192.168.1.100:9997", True, ("192.168.1.100", 9997)),
+    ("localhost:8080", True, ("localhost", 8080)),
+    ("COMPUTER.lan:9997", True, ("COMPUTER.lan", 9997)),  # Hostname starting with COM
+    # Serial connections
+    ("/dev/ttyUSB0", False, None),
+    ("COM1", False, None),
+    # Edge cases
+    ("/dev/tty:with:colons", False, None),  # Starts with /
+    ("COM1:", False, None),  # COM port with a colon
+    # Invalid TCP endpoints
+    ("invalid:port:format", True, None),
+    ("host:invalid_port", True, None),
+    ("host:99999", True, None),
+]
+
+
 class MockTCPServer:
     """Mock TCP server for testing TCP connections."""
 
@@ -22,14 +87,20 @@ class MockTCPServer:
         self.host = host
         self.port = port
         self.server_socket = None
-        self.server_thread = None
+        self.client_sockets = set()
         self.running = False
         self.received_data = []
         self.response_data = b""
+        # Receive buffer that is reused for every read.
+        self._buffer = memoryview(bytearray(65536))
+        # Signalled whenever data is received.
+        self.data_received = threading.Event()
+        self.data_condition = threading.Condition()
 
     def start(self):
         """Start the mock TCP server."""
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        self.server_socket = socket.socket(family, socket.SOCK_STREAM)
         self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.server_socket.bind((self.host, self.port))
 
@@ -37,101 +108,217 @@ class MockTCPServer:
         self.port = self.server_socket.getsockname()[1]
 
         self.server_socket.listen(5)
+        self.server_socket.setblocking(False)
         self.running = True
 
-        self.server_thread = threading.Thread(target=self._server_loop)
-        self.server_thread.daemon = True
-        self.server_thread.start()
-
-        # Wait a bit for server to start
-        time.sleep(0.1)
+        # listen() has completed, so clients can connect as soon as this returns.
+        _SERVER_HUB.register(self.server_socket, self._accept)
 
     def stop(self):
         """Stop the mock TCP server."""
         self.running = False
-        if self.server_socket:
-            self.server_socket.close()
-        if self.server_thread:
-            self.server_thread.join(timeout=1.0)
-
-    def _server_loop(self):
-        """Server loop that handles incoming connections."""
-        while self.running:
-            try:
-                client_socket, _ = self.server_socket.accept()
-                with client_socket:
-                    data = client_socket.recv(1024)
-                    if data:
-                        self.received_data.append(data)
-                    if self.response_data:
-                        client_socket.send(self.response_data)
-            except OSError:
-                # Socket was closed
-                break
+        with _SERVER_HUB.lock:
+            self.close_clients()
+            if self.server_socket:
+                _SERVER_HUB.unregister(self.server_socket)
+                self.server_socket.close()
+
+    def _accept(self, server_socket):
+        """Accept an incoming connection."""
+        try:
+            client_socket, _ = server_socket.accept()
+        except BlockingIOError:
+            return
+        client_socket.setblocking(False)
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.client_sockets.add(client_socket)
+        _SERVER_HUB.register(client_socket, self._read)
+
+    def _read(self, client_socket):
+        """Read from a client until it closes the connection."""
+        try:
+            size = client_socket.recv_into(self._buffer)
+        except BlockingIOError:
+            return
+        except OSError:
+            size = 0
+
+        if not size:
+            _SERVER_HUB.unregister(client_socket)
+            self.client_sockets.discard(client_socket)
+            client_socket.close()
+            return
+
+        # Copy the data out, the buffer is overwritten by the next read.
+        data = bytes(self._buffer[:size])
+        with self.data_condition:
+            self.received_data.append(data)
+            self.data_received.set()
+            self.data_condition.notify_all()
+        if self.response_data:
+            client_socket.sendall(self.response_data)
+
+    def close_clients(self):
+        """Close all client connections from the server side."""
+        with _SERVER_HUB.lock:
+            for client_socket in self.client_sockets:
+                _SERVER_HUB.unregister(client_socket)
+                client_socket.close()
+            self.client_sockets.clear()
+
+    def reset(self):
+        """Forget all received data."""
+        with self.data_condition:
+            self.received_data.clear()
+            self.data_received.clear()
+        self.response_data = b""
+
+    def wait_for_data(self, count=1, timeout=1.0):
+        """Wait until at least count chunks of data have been received."""
+        with self.data_condition:
+            return self.data_condition.wait_for(
+                lambda: len(self.received_data) >= count, timeout
+            )
+
+    def wait_for_bytes(self, size, timeout=1.0):
+        """Wait until at least size bytes of data have been received."""
+        with self.data_condition:
+            return self.data_condition.wait_for(
+                lambda: sum(len(data) for data in self.received_data) >= size, timeout
+            )
 
     def get_endpoint(self):
         """Get the server endpoint as host:port string."""
         return f"{self.host}:{self.port}"
 
 
-class TestTCPConnection(unittest.TestCase):
-    """Unit tests for TCP connection functionality."""
+def unresponsive_endpoint(test_case):
+    """
+    Returns a host:port endpoint where connecting never completes.
 
-    def setUp(self):
-        """Set up test fixtures."""
-        self.address = b"\x01"
-        self.down_duration = 30.0
-        self.up_duration = 25.0
+    The endpoint is a listening socket of which the backlog is full, further connection requests
+    are dropped by the kernel until the client times out.
+    """
+    listen_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    test_case.addCleanup(listen_socket.close)
+    listen_socket.bind(("127.0.0.1", 0))
+    listen_socket.listen(0)
+    endpoint = listen_socket.getsockname()
 
-    def test_is_tcp_connection_detection(self):
-        """Test TCP connection detection."""
-        # TCP connections
-        screen_tcp = XYScreens("192.168.1.100:9997", self.address, self.down_duration)
-        self.assertTrue(screen_tcp.is_tcp_connection)
+    # Fill the backlog.
+    for _ in range(16):
+        client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        client_socket.settimeout(0.1)
+        try:
+            client_socket.connect(endpoint)
+        except TimeoutError:
+            client_socket.close()
+            return f"{endpoint[0]}:{endpoint[1]}"
+        except OSError:
+            client_socket.close()
+            break
+        test_case.addCleanup(client_socket.close)
 
-        screen_tcp2 = XYScreens("localhost:8080", self.address, self.down_duration)
-        self.assertTrue(screen_tcp2.is_tcp_connection)
+    test_case.skipTest("Unable to create an unresponsive TCP endpoint")
+    return None
 
-        # Serial connections
-        screen_serial = XYScreens("/dev/ttyUSB0", self.address, self.down_duration)
-        self.assertFalse(screen_serial.is_tcp_connection)
 
-        screen_serial2 = XYScreens("COM1", self.address, self.down_duration)
-        self.assertFalse(screen_serial2.is_tcp_connection)
+class FakeSerial:
+    """Lightweight stand-in for serial.Serial that records how it is used."""
 
-        # Edge cases
-        screen_serial3 = XYScreens("/dev/tty:with:colons", self.address, self.down_duration)
-        self.assertFalse(screen_serial3.is_tcp_connection)  # Starts with /
+    __slots__ = ("args", "kwargs", "is_open", "writes", "opens", "closes")
 
-    def test_parse_tcp_endpoint(self):
-        """Test TCP endpoint parsing."""
-        screen = XYScreens("192.168.1.100:9997", self.address, self.down_duration)
-        host, port = screen._parse_tcp_endpoint()
-        self.assertEqual(host, "192.168.1.100")
-        self.assertEqual(port, 9997)
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        self.is_open = False
+        self.writes = []
+        self.opens = 0
+        self.closes = 0
 
-        screen2 = XYScreens("localhost:8080", self.address, self.down_duration)
-        host2, port2 = screen2._parse_tcp_endpoint()
-        self.assertEqual(host2, "localhost")
-        self.assertEqual(port2, 8080)
+    def open(self):
+        self.opens += 1
+        self.is_open = True
 
-    def test_parse_tcp_endpoint_invalid(self):
-        """Test TCP endpoint parsing with invalid formats."""
-        screen = XYScreens("/dev/ttyUSB0", self.address, self.down_duration)
-        with self.assertRaises(ValueError):
-            screen._parse_tcp_endpoint()
+    def write(self, data):
+        self.writes.append(data)
+        return len(data)
 
-        screen2 = XYScreens("invalid:port:format", self.address, self.down_duration)
-        with self.assertRaises(ValueError):
-            screen2._parse_tcp_endpoint()
+    def flush(self):
+        pass
 
-        screen3 = XYScreens("host:invalid_port", self.address, self.down_duration)
-        with self.assertRaises(ValueError):
-            screen3._parse_tcp_endpoint()
+    def close(self):
+        self.closes += 1
+        self.is_open = False
 
-        screen4 = XYScreens("host:99999", self.address, self.down_duration)
-        with self.assertRaises(ValueError):
-            screen4._parse_tcp_endpoint()
+
+class PairedSocket:
+    """
+    Wraps one end of a socketpair so it can stand in for a TCP socket.
+
+    Only usable with the synchronous TCP methods, the async methods need a real socket for the
+    event loop.
+    """
+
+    __slots__ = ("sock", "connected_to")
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.connected_to = None
+
+    def settimeout(self, timeout):
+        self.sock.settimeout(timeout)
+
+    def setblocking(self, flag):
+        self.sock.setblocking(flag)
+
+    def setsockopt(self, *args):
+        # TCP options don't apply to a socketpair.
+        pass
+
+    def connect(self, address):
+        self.connected_to = address
+
+    def sendall(self, data):
+        self.sock.sendall(data)
+
+    def close(self):
+        self.sock.close()
+
+
+class TestTCPConnection(unittest.TestCase):
+    """Unit tests for TCP connection functionality."""
+
+    server: MockTCPServer
+
+    @classmethod
+    def setUpClass(cls):
+        """Start one mock TCP server for all tests in this class."""
+        cls.server = MockTCPServer()
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the mock TCP server."""
+        cls.server.stop()
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.address = b"\x01"
+        self.down_duration = 30.0
+        self.up_duration = 25.0
+        self.server.reset()
+
+    def test_tcp_endpoint_detection_and_parsing(self):
+        """Test TCP connection detection and TCP endpoint parsing."""
+        for device, is_tcp, endpoint in DEVICES:
+            with self.subTest(device=device):
+                screen = XYScreens(device, self.address, self.down_duration)
+                self.assertEqual(screen.is_tcp_connection, is_tcp)
+                if endpoint is None:
+                    self.assertRaises(ValueError, screen._parse_tcp_endpoint)
+                else:
+                    self.assertEqual(screen._parse_tcp_endpoint(), endpoint)
 
     def test_create_tcp_classmethod(self):
         """Test the create_tcp class method."""
@@ -153,23 +340,41 @@ class TestTCPConnection(unittest.TestCase):
 
     def test_tcp_send_command_with_mock_server(self):
         """Test sending command via TCP with a mock server."""
-        server = MockTCPServer()
-        server.start()
-
-        try:
-            screen = XYScreens(server.get_endpoint(), self.address, self.down_duration)
-
-            # Test sending up command
-            result = screen._send_command_tcp(screen._commands.up())
-            self.assertTrue(result)
-
-            # Verify data was received
-            time.sleep(0.1)  # Allow time for data to be received
-            self.assertEqual(len(server.received_data), 1)
-            self.assertEqual(server.received_data[0], screen._commands.up())
-
-        finally:
-            server.stop()
+        server = self.server
+        screen = XYScreens(server.get_endpoint(), self.address, self.down_duration)
+        self.addCleanup(screen.close)
+
+        # Test sending up command
+        up_cmd = screen._commands.up()
+        result = screen._send_command_tcp(up_cmd)
+        self.assertTrue(result)
+        # Without keep alive the connection is closed after the command
+        self.assertIsNone(screen._tcp_sock)
+
+        # Verify data was received
+        self.assertTrue(server.data_received.wait(1.0))
+        self.assertEqual(len(server.received_data), 1)
+        self.assertEqual(server.received_data[0], up_cmd)
+
+    def test_tcp_send_commands_reuse_connection(self):
+        """Test that consecutive TCP commands share one connection."""
+        server = self.server
+        screen = XYScreens(server.get_endpoint(), self.address, self.down_duration, keep_alive=True)
+        self.addCleanup(screen.close)
+
+        up_cmd = screen._commands.up()
+        stop_cmd = screen._commands.stop()
+        self.assertTrue(screen._send_command_tcp(up_cmd))
+        sock = screen._tcp_sock
+        self.assertTrue(screen._send_command_tcp(stop_cmd))
+        self.assertIs(screen._tcp_sock, sock)
+
+        screen.close()
+        self.assertIsNone(screen._tcp_sock)
+
+        expected = up_cmd + stop_cmd
+        self.assertTrue(server.wait_for_bytes(len(expected)))
+        self.assertEqual(b"".join(server.received_data), expected)
 
     def test_tcp_send_command_connection_error(self):
         """Test TCP connection error handling."""
@@ -179,7 +384,94 @@ class TestTCPConnection(unittest.TestCase):
         with self.assertRaises(XYScreensConnectionError) as cm:
             screen._send_command_tcp(screen._commands.up())
 
-        self.assertIn("Error while connecting to TCP endpoint", str(cm.exception))
+        # Port 99999 is out of range, so the endpoint can't be parsed
+        self.assertEqual(cm.exception.reason, "parse")
+
+    def test_tcp_send_command_reconnects_after_peer_close(self):
+        """Test that a connection closed by the other end is replaced before sending."""
+        server = self.server
+        screen = XYScreens(server.get_endpoint(), self.address, self.down_duration, keep_alive=True)
+        self.addCleanup(screen.close)
+
+        up_cmd = screen._commands.up()
+        stop_cmd = screen._commands.stop()
+        self.assertTrue(screen._send_command_tcp(up_cmd))
+        self.assertTrue(server.wait_for_bytes(len(up_cmd)))
+
+        # Close the connection from the server side and wait for the FIN to arrive
+        server.close_clients()
+        sock = screen._tcp_sock
+        select.select([sock], [], [], 1.0)
+
+        self.assertTrue(screen._send_command_tcp(stop_cmd))
+        self.assertIsNot(screen._tcp_sock, sock)
+
+        expected = up_cmd + stop_cmd
+        self.assertTrue(server.wait_for_bytes(len(expected)))
+        self.assertEqual(b"".join(server.received_data), expected)
+
+    def test_tcp_send_commands_reuse_connection_high_fd(self):
+        """Test that a connection with a file descriptor of 1024 or higher is reused."""
+        # Occupy the lower file descriptors so the connection gets a high one
+        try:
+            fillers = [socket.socket() for _ in range(1100)]
+        except OSError:
+            self.skipTest("Not enough file descriptors available")
+        for filler in fillers:
+            self.addCleanup(filler.close)
+
+        server = self.server
+        screen = XYScreens(server.get_endpoint(), self.address, self.down_duration, keep_alive=True)
+        self.addCleanup(screen.close)
+
+        self.assertTrue(screen._send_command_tcp(screen._commands.up()))
+        sock = screen._tcp_sock
+        self.assertGreaterEqual(sock.fileno(), 1024)
+        self.assertTrue(screen._send_command_tcp(screen._commands.stop()))
+        self.assertIs(screen._tcp_sock, sock)
+
+    def test_tcp_send_command_ipv6(self):
+        """Test sending command via TCP to an IPv6 endpoint."""
+        server = MockTCPServer(host="::1")
+        try:
+            server.start()
+        except OSError:
+            self.skipTest("IPv6 is not available")
+        self.addCleanup(server.stop)
+
+        screen = XYScreens(server.get_endpoint(), self.address, self.down_duration)
+        self.addCleanup(screen.close)
+
+        up_cmd = screen._commands.up()
+        self.assertTrue(screen._send_command_tcp(up_cmd))
+
+        self.assertTrue(server.wait_for_bytes(len(up_cmd)))
+        self.assertEqual(server.received_data[0], up_cmd)
+
+    def test_tcp_send_command_connection_refused(self):
+        """Test TCP connection error handling when the connection is refused."""
+        # A bound socket that isn't listening refuses connections
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as closed_socket:
+            closed_socket.bind(("127.0.0.1", 0))
+            port = closed_socket.getsockname()[1]
+            screen = XYScreens(f"127.0.0.1:{port}", self.address, self.down_duration)
+
+            with self.assertRaises(XYScreensConnectionError) as cm:
+                screen._send_command_tcp(screen._commands.up())
+
+        self.assertEqual(cm.exception.reason, "connect")
+        self.assertIsNone(screen._tcp_sock)
+
+    def test_tcp_send_command_timeout(self):
+        """Test TCP connection timeout handling."""
+        endpoint = unresponsive_endpoint(self)
+        screen = XYScreens(endpoint, self.address, self.down_duration, connect_timeout=0.05)
+
+        with self.assertRaises(XYScreensConnectionError) as cm:
+            screen._send_command_tcp(screen._commands.program())
+
+        self.assertEqual(cm.exception.reason, "timeout")
+        self.assertIsNone(screen._tcp_sock)
 
     def test_tcp_send_command_invalid_endpoint(self):
         """Test TCP command sending with invalid endpoint format."""
@@ -188,37 +480,98 @@ class TestTCPConnection(unittest.TestCase):
         with self.assertRaises(XYScreensConnectionError) as cm:
             screen._send_command_tcp(screen._commands.up())
 
-        self.assertIn("Error while connecting to TCP endpoint", str(cm.exception))
+        self.assertEqual(cm.exception.reason, "parse")
 
 
 class TestTCPConnectionAsync(unittest.IsolatedAsyncioTestCase):
     """Unit tests for async TCP connection functionality."""
 
+    server: MockTCPServer
+
+    # Run the tests on uvloop when it is installed, IsolatedAsyncioTestCase only supports a custom
+    # event loop from Python 3.13 onwards and uses the default event loop on older versions.
+    if uvloop is not None and sys.version_info >= (3, 13):
+        loop_factory = uvloop.new_event_loop
+
+    @classmethod
+    def setUpClass(cls):
+        """Start one mock TCP server for all tests in this class."""
+        cls.server = MockTCPServer()
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the mock TCP server."""
+        cls.server.stop()
+
     def setUp(self):
         """Set up test fixtures."""
         self.address = b"\x01"
         self.down_duration = 30.0
         self.up_duration = 25.0
+        self.server.reset()
 
     async def test_async_tcp_send_command_with_mock_server(self):
         """Test sending command via TCP asynchronously with a mock server."""
-        server = MockTCPServer()
-        server.start()
-
+        server = self.server
+        screen = XYScreens(server.get_endpoint(), self.address, self.down_duration)
+        self.addCleanup(screen.close)
+
+        # Test sending down command
+        down_cmd = screen._commands.down()
+        result = await screen._async_send_command_tcp(down_cmd)
+        self.assertTrue(result)
+        # Without keep alive the connection is closed after the command
+        self.assertIsNone(screen._async_tcp_sock)
+
+        # Verify data was received
+        loop = asyncio.get_running_loop()
+        self.assertTrue(await loop.run_in_executor(None, server.data_received.wait, 1.0))
+        self.assertEqual(len(server.received_data), 1)
+        self.assertEqual(server.received_data[0], down_cmd)
+
+    async def test_async_tcp_send_command_reconnects_after_peer_close(self):
+        """Test that an async connection closed by the other end is replaced before sending."""
+        server = self.server
+        screen = XYScreens(server.get_endpoint(), self.address, self.down_duration, keep_alive=True)
+        self.addCleanup(screen.close)
+        loop = asyncio.get_running_loop()
+
+        up_cmd = screen._commands.up()
+        stop_cmd = screen._commands.stop()
+        self.assertTrue(await screen._async_send_command_tcp(up_cmd))
+        self.assertTrue(await loop.run_in_executor(None, server.wait_for_bytes, len(up_cmd)))
+
+        # Close the connection from the server side and wait for the FIN to arrive
+        server.close_clients()
+        sock = screen._async_tcp_sock
+        await loop.run_in_executor(None, select.select, [sock], [], [], 1.0)
+
+        self.assertTrue(await screen._async_send_command_tcp(stop_cmd))
+        self.assertIsNot(screen._async_tcp_sock, sock)
+
+        expected = up_cmd + stop_cmd
+        self.assertTrue(await loop.run_in_executor(None, server.wait_for_bytes, len(expected)))
+        self.assertEqual(b"".join(server.received_data), expected)
+
+    async def test_async_tcp_send_command_ipv6(self):
+        """Test sending command via TCP asynchronously to an IPv6 endpoint."""
+        server = MockTCPServer(host="::1")
         try:
-            screen = XYScreens(server.get_endpoint(), self.address, self.down_duration)
+            server.start()
+        except OSError:
+            self.skipTest("IPv6 is not available")
+        self.addCleanup(server.stop)
 
-            # Test sending down command
-            result = await screen._async_send_command_tcp(screen._commands.down())
-            self.assertTrue(result)
+        screen = XYScreens(server.get_endpoint(), self.address, self.down_duration)
+        self.addCleanup(screen.close)
 
-            # Verify data was received
-            await asyncio.sleep(0.1)  # Allow time for data to be received
-            self.assertEqual(len(server.received_data), 1)
-            self.assertEqual(server.received_data[0], screen._commands.down())
+        down_cmd = screen._commands.down()
+        self.assertTrue(await screen._async_send_command_tcp(down_cmd))
 
-        finally:
-            server.stop()
+        loop = asyncio.get_running_loop()
+        self.assertTrue(await loop.run_in_executor(None, server.wait_for_bytes, len(down_cmd)))
+        self.assertEqual(server.received_data[0], down_cmd)
 
     async def test_async_tcp_send_command_connection_error(self):
         """Test async TCP connection error handling."""
@@ -228,37 +581,37 @@ class TestTCPConnectionAsync(unittest.IsolatedAsyncioTestCase):
         with self.assertRaises(XYScreensConnectionError) as cm:
             await screen._async_send_command_tcp(screen._commands.stop())
 
-        self.assertIn("Error while connecting to TCP endpoint", str(cm.exception))
+        # Port 99999 is out of range, so the endpoint can't be parsed
+        self.assertEqual(cm.exception.reason, "parse")
 
     async def test_async_tcp_send_command_timeout(self):
         """Test async TCP connection timeout handling."""
-        # Use a non-routable IP to force timeout (according to RFC5737)
-        screen = XYScreens("192.0.2.1:9999", self.address, self.down_duration)
+        endpoint = unresponsive_endpoint(self)
+        screen = XYScreens(endpoint, self.address, self.down_duration, connect_timeout=0.05)
 
         with self.assertRaises(XYScreensConnectionError) as cm:
             await screen._async_send_command_tcp(screen._commands.program())
 
-        self.assertIn("Error while connecting to TCP endpoint", str(cm.exception))
+        self.assertEqual(cm.exception.reason, "timeout")
+        self.assertIsNone(screen._async_tcp_sock)
 
     async def test_high_level_async_methods_tcp(self):
         """Test high-level async methods with TCP connection."""
-        server = MockTCPServer()
-        server.start()
-
-        try:
-            # Create screen with initial position at 50% (middle)
-            screen = XYScreens(server.get_endpoint(), self.address, self.down_duration, position=50.0)
+        server = self.server
+        # Create screen with initial position at 50% (middle)
+        screen = XYScreens(server.get_endpoint(), self.address, self.down_duration, position=50.0)
+        self.addCleanup(screen.close)
+        # Stop the set position task, also when an assertion fails.
+        self.addAsyncCleanup(screen.async_stop)
 
-            # Test async_up method (should move from 50% to 0%)
-            result = await screen.async_up()
-            self.assertTrue(result)
+        # Test async_up method (should move from 50% to 0%)
+        result = await screen.async_up()
+        self.assertTrue(result)
 
-            # Should have received commands (up command + potentially stop command)
-            await asyncio.sleep(0.2)  # Give more time for async operations
-            self.assertGreater(len(server.received_data), 0)
-
-        finally:
-            server.stop()
+        # Should have received commands (up command + potentially stop command)
+        loop = asyncio.get_running_loop()
+        self.assertTrue(await loop.run_in_executor(None, server.wait_for_data, 1))
+        self.assertGreater(len(server.received_data), 0)
 
 
 class TestMixedConnections(unittest.TestCase):
@@ -269,34 +622,56 @@ class TestMixedConnections(unittest.TestCase):
         self.address = b"\x01"
         self.down_duration = 30.0
 
-    @patch('serial.Serial')
-    def test_send_command_routes_to_serial(self, mock_serial):
+    def _replace(self, module, name, replacement):
+        # Patch for the duration of a single test only, module wide patches are not safe when the
+        # tests run in parallel with pytest-xdist.
+        original = getattr(module, name)
+        setattr(module, name, replacement)
+        self.addCleanup(setattr, module, name, original)
+
+    def test_send_command_routes_to_serial(self):
         """Test that _send_command routes to serial for serial connections."""
-        mock_connection = Mock()
-        mock_connection.is_open = False
-        mock_serial.return_value = mock_connection
+        fakes = []
+
+        def serial_factory(*args, **kwargs):
+            fake = FakeSerial(*args, **kwargs)
+            fakes.append(fake)
+            return fake
+
+        self._replace(serial, "Serial", serial_factory)
 
         screen = XYScreens("/dev/ttyUSB0", self.address, self.down_duration)
-        screen._send_command(screen._commands.up())
+        up_cmd = screen._commands.up()
+        screen._send_command(up_cmd)
 
         # Verify serial connection was created
-        mock_serial.assert_called_once()
-        mock_connection.open.assert_called_once()
-        mock_connection.write.assert_called_once()
+        self.assertEqual(len(fakes), 1)
+        fake = fakes[0]
+        self.assertEqual(fake.opens, 1)
+        self.assertEqual(fake.writes, [up_cmd])
 
-    @patch('socket.socket')
-    def test_send_command_routes_to_tcp(self, mock_socket):
+    def test_send_command_routes_to_tcp(self):
         """Test that _send_command routes to TCP for TCP connections."""
-        mock_sock = Mock()
-        mock_socket.return_value = mock_sock
+        client, peer = socket.socketpair()
+        self.addCleanup(peer.close)
+        paired = PairedSocket(client)
+        socket_args = []
+
+        def socket_factory(*args):
+            socket_args.append(args)
+            return paired
 
         screen = XYScreens("192.168.1.100:9997", self.address, self.down_duration)
-        screen._send_command(screen._commands.down())
+        screen._socket_factory = socket_factory
+        self.addCleanup(screen.close)
+        down_cmd = screen._commands.down()
+        screen._send_command(down_cmd)
 
         # Verify TCP connection was created
-        mock_socket.assert_called_once_with(socket.AF_INET, socket.SOCK_STREAM)
-        mock_sock.connect.assert_called_once_with(("192.168.1.100", 9997))
-        mock_sock.sendall.assert_called_once()
+        self.assertEqual(len(socket_args), 1)
+        self.assertEqual(socket_args[0][:2], (socket.AF_INET, socket.SOCK_STREAM))
+        self.assertEqual(paired.connected_to, ("192.168.1.100", 9997))
+        self.assertEqual(peer.recv(4096), down_cmd)
 
 
 if __name__ == "__main__":
@@ -28,6 +28,7 @@ async def main(port: str, address: bytes, wait: int, action: str):
     else:
         down_duration = wait
 
+    screen: XYScreens | None = None
     try:
         if action == "up":
             screen = XYScreens(port, address, down_duration, position=100.0)
@@ -69,6 +70,10 @@ async def main(port: str, address: bytes, wait: int, action: str):
     except KeyboardInterrupt:
         # Handle keyboard interrupt
         pass
+    finally:
+        # Release the TCP connection, if any.
+        if screen is not None:
+            screen.close()
 
 
 if __name__ == "__main__":
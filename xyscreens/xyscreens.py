@@ -9,10 +9,13 @@ Created on 17 Nov 2022
 
 import asyncio
 import logging
+import re
+import selectors
 import socket
+import threading
 import time
 from enum import IntEnum
-from typing import Any, Tuple
+from typing import Any, Callable, Literal, Tuple
 
 import serial
 import serial_asyncio_fast as serial_asyncio
@@ -21,14 +24,26 @@ from .task_helper import save_task_reference
 
 logger = logging.getLogger(__name__)
 
+# Windows COM ports, optionally followed by a colon.
+_COM_PORT = re.compile(r"COM\d+:?")
+
 
 class XYScreensConnectionError(Exception):
     """
     XY Screens Connection Error.
 
-    When an error occurs while connecting to the projector screen or lift.
+    When an error occurs while connecting to the projector screen or lift. The reason attribute
+    tells whether connecting, parsing the endpoint, a timeout or sending the command failed.
     """
 
+    def __init__(
+        self,
+        message: str,
+        reason: Literal["connect", "parse", "timeout", "send"] = "connect",
+    ):
+        super().__init__(message)
+        self.reason = reason
+
 
 class XYScreensCommands:
     "The commands needed to move and stop the screen"
@@ -44,29 +59,38 @@ class XYScreensCommands:
     def __init__(self, address: bytes):
         self._address = address
 
+        # The address doesn't change, so build the command frames once.
+        prefix = XYScreensCommands._PREFIX + address
+        self._up = prefix + XYScreensCommands._UP
+        self._micro_up = prefix + XYScreensCommands._MICRO_UP
+        self._stop = prefix + XYScreensCommands._STOP
+        self._down = prefix + XYScreensCommands._DOWN
+        self._micro_down = prefix + XYScreensCommands._MICRO_DOWN
+        self._program = prefix + XYScreensCommands._PROGRAM
+
     def up(self) -> bytes:
         "Returns the command needed to start moving the screen up."
-        return XYScreensCommands._PREFIX + self._address + XYScreensCommands._UP
+        return self._up
 
     def micro_up(self) -> bytes:
         "Returns the command needed to move the screen up one step."
-        return XYScreensCommands._PREFIX + self._address + XYScreensCommands._MICRO_UP
+        return self._micro_up
 
     def stop(self) -> bytes:
         "Returns the command needed for stopping the screen."
-        return XYScreensCommands._PREFIX + self._address + XYScreensCommands._STOP
+        return self._stop
 
     def down(self) -> bytes:
         "Returns the command needed to start moving the screen down."
-        return XYScreensCommands._PREFIX + self._address + XYScreensCommands._DOWN
+        return self._down
 
     def micro_down(self) -> bytes:
         "Returns the command needed to move the screen down one step."
-        return XYScreensCommands._PREFIX + self._address + XYScreensCommands._MICRO_DOWN
+        return self._micro_down
 
     def program(self) -> bytes:
         "Returns the command needed for programming the screen address."
-        return XYScreensCommands._PREFIX + self._address + XYScreensCommands._PROGRAM
+        return self._program
 
 
 class XYScreensState(IntEnum):
@@ -100,6 +124,27 @@ class XYScreens:
     # pylint: disable=too-many-instance-attributes
     # The connection endpoint (serial port or TCP host:port) where the screen is connected to.
     _connection_endpoint: str | None = None
+    # Whether the connection endpoint is a TCP host:port pair.
+    _is_tcp: bool = False
+    # The parsed TCP host and port, None for serial or invalid TCP endpoints.
+    _tcp_endpoint: tuple[str, int] | None = None
+    # Whether TCP connections are kept open between commands.
+    _keep_alive: bool = False
+    # The TCP connection, kept open between commands when keep alive is enabled.
+    _tcp_sock: socket.socket | None = None
+    # Lock to serialise the use of the persistent TCP connection.
+    _tcp_lock: threading.Lock
+    # The TCP connection used by the async methods and the event loop it belongs to.
+    _async_tcp_sock: socket.socket | None = None
+    _async_tcp_loop: asyncio.AbstractEventLoop | None = None
+    # Lock to serialise the use of the persistent async TCP connection.
+    _async_tcp_lock: asyncio.Lock | None = None
+    # Timeout in seconds for establishing a TCP connection, also used as the write timeout of the
+    # connection.
+    _connect_timeout: float = 1.0
+    # Creates the sockets for TCP connections, can be replaced for testing. The async methods hand
+    # the socket to the event loop, so there the factory has to return a real socket.
+    _socket_factory: Callable[..., socket.socket] = socket.socket
     # The amount of time in seconds it takes the screen to close from the fully-open state.
     _up_duration: float
     # The amount of time in seconds it takes the screen to open up from the fully-closed state.
@@ -129,6 +174,9 @@ class XYScreens:
         ) = None,  # Duration in seconds for the screen to go up.
         position: float = 0.0,  # Position of the screen where 0.0 is totally up and 100.0 is
         # fully down.
+        connect_timeout: float = 1.0,  # Timeout in seconds for connecting to and writing to TCP
+        # endpoints.
+        keep_alive: bool = False,  # Keep TCP connections open between commands.
     ):
         "Initialises the XYScreens object."
         # pylint: disable=too-many-arguments
@@ -140,8 +188,28 @@ class XYScreens:
         assert up_duration is None or up_duration > 0.0
         assert address is not None
         assert position >= 0.0
+        assert connect_timeout > 0.0
 
         self._connection_endpoint = serial_port
+        self._connect_timeout = connect_timeout
+        self._keep_alive = keep_alive
+        # Detect the connection type and parse the TCP endpoint once, the endpoint does not change
+        # during the lifetime of the object.
+        # Serial ports are device paths (/dev/...) or Windows COM ports, anything else containing a
+        # colon is a TCP host:port pair.
+        self._is_tcp = (
+            serial_port[:1] not in ("", "/")
+            and ":" in serial_port
+            and _COM_PORT.fullmatch(serial_port) is None
+        )
+        if self._is_tcp:
+            try:
+                self._tcp_endpoint = self._split_tcp_endpoint(serial_port)
+            except ValueError:
+                # Invalid TCP endpoints are reported when a command is sent.
+                self._tcp_endpoint = None
+        self._tcp_lock = threading.Lock()
+
         # Set the duration for the screen to go down.
         self._down_duration = down_duration
 
@@ -167,6 +235,8 @@ class XYScreens:
         down_duration: float,
         up_duration: float | None = None,
         position: float = 0.0,
+        connect_timeout: float = 1.0,
+        keep_alive: bool = False,
     ):
         """Create an XYScreens instance with TCP connection.
 
@@ -177,9 +247,21 @@ class XYScreens:
             down_duration: Duration in seconds for screen to go down
             up_duration: Duration in seconds for screen to go up (defaults to down_duration)
             position: Initial position (0.0 = up, 100.0 = down)
+            connect_timeout: Timeout in seconds for connecting to and writing to the endpoint
+            keep_alive: Keep the TCP connection open between commands, call close() to release it
         """
+        # pylint: disable=too-many-arguments
+
         endpoint = f"{host}:{port}"
-        return cls(endpoint, address, down_duration, up_duration, position)
+        return cls(
+            endpoint,
+            address,
+            down_duration,
+            up_duration,
+            position,
+            connect_timeout,
+            keep_alive=keep_alive,
+        )
 
     @classmethod
     def create_serial(
@@ -214,29 +296,35 @@ class XYScreens:
     @property
     def is_tcp_connection(self) -> bool:
         """Returns True if this is a TCP connection, False for serial."""
-        return self._is_tcp_connection()
-
-    def _is_tcp_connection(self) -> bool:
-        """Check if the connection endpoint is a TCP host:port pair."""
-        return ":" in self._connection_endpoint and not self._connection_endpoint.startswith("/")
-
-    def _parse_tcp_endpoint(self) -> tuple[str, int]:
-        """Parse TCP endpoint into host and port."""
-        if not self._is_tcp_connection():
-            raise ValueError(f"Not a TCP endpoint: {self._connection_endpoint}")
+        return self._is_tcp
 
-        parts = self._connection_endpoint.rsplit(":", 1)
+    @staticmethod
+    def _split_tcp_endpoint(endpoint: str) -> tuple[str, int]:
+        """Split a TCP endpoint string into host and port."""
+        parts = endpoint.rsplit(":", 1)
         if len(parts) != 2:
-            raise ValueError(f"Invalid TCP endpoint format: {self._connection_endpoint}")
+            raise ValueError(f"Invalid TCP endpoint format: {endpoint}")
 
         host, port_str = parts
         try:
             port = int(port_str)
-            if not (1 <= port <= 65535):
+            if not 1 <= port <= 65535:
                 raise ValueError(f"Port out of range: {port}")
             return (host, port)
         except ValueError as ex:
-            raise ValueError(f"Invalid port in TCP endpoint: {self._connection_endpoint}") from ex
+            raise ValueError(f"Invalid port in TCP endpoint: {endpoint}") from ex
+
+    def _parse_tcp_endpoint(self) -> tuple[str, int]:
+        """Returns the TCP endpoint as host and port."""
+        if not self._is_tcp:
+            raise ValueError(f"Not a TCP endpoint: {self._connection_endpoint}")
+
+        if self._tcp_endpoint is None:
+            # The endpoint could not be parsed at construction, parse again to raise the error.
+            assert self._connection_endpoint is not None
+            return self._split_tcp_endpoint(self._connection_endpoint)
+
+        return self._tcp_endpoint
 
     def restore_position(self, position: float) -> None:
         """
@@ -274,7 +362,7 @@ class XYScreens:
         self._callbacks.append(callback)
 
     def _send_command(self, command: bytes) -> bool:
-        if self._is_tcp_connection():
+        if self._is_tcp:
             return self._send_command_tcp(command)
         else:
             return self._send_command_serial(command)
@@ -313,41 +401,134 @@ class XYScreens:
             return True
         except serial.SerialException as ex:
             raise XYScreensConnectionError(
-                f"Error while writing to device {self._connection_endpoint}"
+                f"Error while writing to device {self._connection_endpoint}", "send"
             ) from ex
 
         return False
 
-    def _send_command_tcp(self, command: bytes) -> bool:
-        try:
-            host, port = self._parse_tcp_endpoint()
+    @staticmethod
+    def _set_tcp_options(sock: socket.socket) -> None:
+        """Configures a TCP socket for sending small commands over a long lived connection."""
+        # Commands are only a few bytes, send them immediately instead of letting Nagle's
+        # algorithm hold them back, and keep the connection alive between commands.
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
 
-            # Create TCP connection
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(1.0)  # 1 second timeout to match serial timeout
+    def _connect_tcp(self) -> socket.socket:
+        host, port = self._parse_tcp_endpoint()
 
-            logger.debug("Connecting to TCP endpoint %s:%d", host, port)
-            sock.connect((host, port))
+        # Resolve the host so IPv6 addresses and hosts are supported.
+        addresses = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+
+        logger.debug("Connecting to TCP endpoint %s:%d", host, port)
+        last_ex: OSError | None = None
+        for family, sock_type, proto, _, address in addresses:
+            # Create TCP connection
+            sock = self._socket_factory(family, sock_type, proto)
+            sock.settimeout(self._connect_timeout)
+            try:
+                sock.connect(address)
+            except OSError as ex:
+                # Try the next address.
+                sock.close()
+                last_ex = ex
+                continue
             logger.debug("TCP connection established to %s:%d", host, port)
 
-            # Send the command.
-            logger.debug("Sending: 0x%s", command.hex())
-            sock.sendall(command)
-            logger.info("Command successfully sent")
+            self._set_tcp_options(sock)
 
-            # Close the connection.
-            sock.close()
+            return sock
+
+        if last_ex is not None:
+            raise last_ex
+        raise OSError(f"No addresses found for {host}")
 
+    def _close_tcp(self) -> None:
+        if self._tcp_sock is not None:
+            self._tcp_sock.close()
+            self._tcp_sock = None
+
+    def _close_async_tcp(self) -> None:
+        if self._async_tcp_sock is not None:
+            self._async_tcp_sock.close()
+            self._async_tcp_sock = None
+
+    def close(self) -> None:
+        "Closes the TCP connections if any are open."
+        with self._tcp_lock:
+            self._close_tcp()
+        self._close_async_tcp()
+
+    def __del__(self):
+        self._close_tcp()
+        self._close_async_tcp()
+
+    @staticmethod
+    def _tcp_peer_closed(sock: socket.socket) -> bool:
+        """Returns True when the other end has closed the TCP connection."""
+        # A closed connection is readable and peeking returns no data. sendall() on such a
+        # connection still succeeds, so the command would be lost without this check. A selector
+        # is used as select.select() can't handle file descriptors of 1024 and higher.
+        try:
+            with selectors.DefaultSelector() as selector:
+                selector.register(sock, selectors.EVENT_READ)
+                if not selector.select(0):
+                    return False
+            return sock.recv(1, socket.MSG_PEEK) == b""
+        except OSError:
             return True
-        except (socket.error, OSError, ValueError) as ex:
-            raise XYScreensConnectionError(
-                f"Error while connecting to TCP endpoint {self._connection_endpoint}: {ex}"
-            ) from ex
+
+    @staticmethod
+    def _tcp_error_reason(
+        ex: Exception, connected: bool
+    ) -> Literal["connect", "parse", "timeout", "send"]:
+        """Classifies an error raised while sending a command over TCP."""
+        if isinstance(ex, ValueError):
+            return "parse"
+        if isinstance(ex, TimeoutError):
+            return "timeout"
+        if connected:
+            return "send"
+        return "connect"
+
+    def _send_command_tcp(self, command: bytes) -> bool:
+        with self._tcp_lock:
+            try:
+                if self._tcp_sock is not None and self._tcp_peer_closed(self._tcp_sock):
+                    logger.debug("TCP connection closed by the other end, reconnecting")
+                    self._close_tcp()
+                if self._tcp_sock is None:
+                    self._tcp_sock = self._connect_tcp()
+
+                # Send the command.
+                logger.debug("Sending: 0x%s", command.hex())
+                try:
+                    self._tcp_sock.sendall(command)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The connection was closed by the other end, reconnect and try once more.
+                    logger.debug("TCP connection lost, reconnecting")
+                    self._close_tcp()
+                    self._tcp_sock = self._connect_tcp()
+                    self._tcp_sock.sendall(command)
+                logger.info("Command successfully sent")
+
+                if not self._keep_alive:
+                    # Close the connection.
+                    self._close_tcp()
+
+                return True
+            except (socket.error, OSError, ValueError) as ex:
+                reason = self._tcp_error_reason(ex, self._tcp_sock is not None)
+                self._close_tcp()
+                raise XYScreensConnectionError(
+                    f"Error while connecting to TCP endpoint {self._connection_endpoint}: {ex}",
+                    reason,
+                ) from ex
 
         return False
 
     async def _async_send_command(self, command: bytes) -> bool:
-        if self._is_tcp_connection():
+        if self._is_tcp:
             return await self._async_send_command_tcp(command)
         else:
             return await self._async_send_command_serial(command)
@@ -383,36 +564,91 @@ class XYScreens:
             return True
         except serial.SerialException as ex:
             raise XYScreensConnectionError(
-                f"Error while writing to device {self._connection_endpoint}"
+                f"Error while writing to device {self._connection_endpoint}", "send"
             ) from ex
 
         return False
 
-    async def _async_send_command_tcp(self, command: bytes) -> bool:
-        try:
-            host, port = self._parse_tcp_endpoint()
+    async def _async_connect_tcp(self, loop: asyncio.AbstractEventLoop) -> socket.socket:
+        host, port = self._parse_tcp_endpoint()
 
-            logger.debug("Connecting to TCP endpoint %s:%d", host, port)
-            reader, writer = await asyncio.wait_for(
-                asyncio.open_connection(host, port), timeout=1.0
-            )
+        # Resolve the host so IPv6 addresses and hosts are supported.
+        addresses = await asyncio.wait_for(
+            loop.getaddrinfo(host, port, type=socket.SOCK_STREAM),
+            timeout=self._connect_timeout,
+        )
+
+        logger.debug("Connecting to TCP endpoint %s:%d", host, port)
+        last_ex: OSError | None = None
+        for family, sock_type, proto, _, address in addresses:
+            sock = self._socket_factory(family, sock_type, proto)
+            try:
+                sock.setblocking(False)
+                self._set_tcp_options(sock)
+                await asyncio.wait_for(
+                    loop.sock_connect(sock, address), timeout=self._connect_timeout
+                )
+            except OSError as ex:
+                # Try the next address.
+                sock.close()
+                last_ex = ex
+                continue
+            except BaseException:
+                sock.close()
+                raise
             logger.debug("TCP connection established to %s:%d", host, port)
 
-            # Send the command.
-            logger.debug("Sending: 0x%s", command.hex())
-            writer.write(command)
-            await writer.drain()
-            logger.info("Command successfully sent")
+            return sock
 
-            # Close the connection.
-            writer.close()
-            await writer.wait_closed()
+        if last_ex is not None:
+            raise last_ex
+        raise OSError(f"No addresses found for {host}")
 
-            return True
-        except (asyncio.TimeoutError, OSError, ValueError) as ex:
-            raise XYScreensConnectionError(
-                f"Error while connecting to TCP endpoint {self._connection_endpoint}: {ex}"
-            ) from ex
+    async def _async_send_command_tcp(self, command: bytes) -> bool:
+        loop = asyncio.get_running_loop()
+        if self._async_tcp_loop is not loop:
+            # A socket registered with another event loop can't be reused.
+            self._close_async_tcp()
+            self._async_tcp_loop = loop
+            self._async_tcp_lock = asyncio.Lock()
+
+        lock = self._async_tcp_lock
+        assert lock is not None
+
+        async with lock:
+            try:
+                if self._async_tcp_sock is not None and self._tcp_peer_closed(
+                    self._async_tcp_sock
+                ):
+                    logger.debug("TCP connection closed by the other end, reconnecting")
+                    self._close_async_tcp()
+                if self._async_tcp_sock is None:
+                    self._async_tcp_sock = await self._async_connect_tcp(loop)
+
+                # Send the command.
+                logger.debug("Sending: 0x%s", command.hex())
+                try:
+                    await loop.sock_sendall(self._async_tcp_sock, command)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The connection was closed by the other end, reconnect and try once more.
+                    logger.debug("TCP connection lost, reconnecting")
+                    self._close_async_tcp()
+                    self._async_tcp_sock = await self._async_connect_tcp(loop)
+                    await loop.sock_sendall(self._async_tcp_sock, command)
+                logger.info("Command successfully sent")
+
+                if not self._keep_alive:
+                    # Close the connection.
+                    self._close_async_tcp()
+
+                return True
+            except (asyncio.TimeoutError, OSError, ValueError) as ex:
+                reason = self._tcp_error_reason(ex, self._async_tcp_sock is not None)
+                self._close_async_tcp()
+                raise XYScreensConnectionError(
+                    f"Error while connecting to TCP endpoint {self._connection_endpoint}: {ex}",
+                    reason,
+                ) from ex
 
         return False
 